@@ -1,6 +1,8 @@
 _base_ = '../_base_/default_runtime.py'
 dataset_info = '../_base_/datasets/coco.py'
 
+import os  # noqa: E402  # must follow _base_ to keep a non-lazy config
+
 data_root = '/home/houbowei/subcoco/'
 # dataset_type = 'YOLOv5CocoDataset'
 dataset_type = 'YOLOv5PoseCocoDataset'
@@ -11,11 +13,19 @@ widen_factor = 0.5
 
 save_epoch_intervals = 1
 train_batch_size_per_gpu = 8
-# NOTE: for debugging set to 0
-train_num_workers = 8
+# Scale workers with the CPU cores available per local process, clamped to
+# [2, 8]. LOCAL_WORLD_SIZE is set by torchrun / torch.distributed.launch.
+# NOTE: for debugging with 0 workers, `persistent_workers` and
+# `prefetch_factor` must be overridden as well, e.g.
+# `--cfg-options train_dataloader.num_workers=0
+# train_dataloader.persistent_workers=False
+# train_dataloader.prefetch_factor=None` (likewise for val_dataloader).
+train_num_workers = min(
+    8,
+    max(2, (os.cpu_count() or 4) //
+        max(1, int(os.environ.get('LOCAL_WORLD_SIZE', 1)))))
 val_batch_size_per_gpu = 1
-# NOTE: for debugging set to 0
-val_num_workers = 8
+val_num_workers = train_num_workers
 
 max_epochs = 100  # NOTE: for debug
 num_last_epochs = 15
@@ -33,8 +43,14 @@ model = dict(
     # TODO: Waiting for mmengine support
     use_syncbn=False,
     data_preprocessor=dict(
-        type='mmdet.DetDataPreprocessor',
+        type='YOLOXPoseDetDataPreprocessor',
         pad_size_divisor=32,
+        # pad each batch to a square on device instead of `mmdet.Pad`
+        # in the data pipeline
+        pad_to_square=True,
+        pad_value=114.0,
+        # async H2D copy of the pinned batches
+        non_blocking=True,
         batch_augments=[
             dict(
                 type='mmdet.BatchSyncRandomResize',
@@ -116,12 +132,6 @@ pre_transform = [
 train_pipeline_stage1 = [
     *pre_transform,
     dict(type='YOLOPoseResize', scale=img_scale, keep_ratio=True),
-    dict(
-        type='mmdet.Pad',
-        pad_to_square=True,
-        # If the image is three-channel, the pad value needs
-        # to be set separately for each channel.
-        pad_val=dict(img=(114.0, 114.0, 114.0))),
     # dict(
     #     type='MosaicKeypoints',
     #     img_scale=img_scale,
@@ -159,12 +169,6 @@ train_pipeline_stage1 = [
 train_pipeline_stage2 = [
     *pre_transform,
     dict(type='YOLOPoseResize', scale=img_scale, keep_ratio=True),
-    dict(
-        type='mmdet.Pad',
-        pad_to_square=True,
-        # If the image is three-channel, the pad value needs
-        # to be set separately for each channel.
-        pad_val=dict(img=(114.0, 114.0, 114.0))),
     # dict(type='mmdet.YOLOXHSVRandomAug'),
     # dict(type='YOLOPoseRandomFlip', prob=0.5),
     dict(
@@ -179,8 +183,9 @@ train_pipeline_stage2 = [
 train_dataloader = dict(
     batch_size=train_batch_size_per_gpu,
     num_workers=train_num_workers,
-    persistent_workers=False,  # NOTE: for debugging
-    pin_memory=False,  # NOTE: for debugging
+    persistent_workers=True,
+    pin_memory=True,
+    prefetch_factor=4,
     sampler=dict(type='DefaultSampler', shuffle=True),
     dataset=dict(
         type=dataset_type,
@@ -195,10 +200,6 @@ test_pipeline = [
     *pre_transform,
     # dict(type='LoadImageFromFile', file_client_args=_base_.file_client_args),
     dict(type='YOLOPoseResize', scale=img_scale, keep_ratio=True),
-    dict(
-        type='mmdet.Pad',
-        pad_to_square=True,
-        pad_val=dict(img=(114.0, 114.0, 114.0))),
      dict(
         type='YOLOPoseFilterAnnotations',
         min_gt_bbox_wh=(1, 1),
@@ -215,8 +216,9 @@ test_pipeline = [
 val_dataloader = dict(
     batch_size=val_batch_size_per_gpu,
     num_workers=val_num_workers,
-    persistent_workers=False,  # NOTE: for debugging
-    pin_memory=False,  # NOTE: for debugging
+    persistent_workers=True,
+    pin_memory=True,
+    prefetch_factor=4,
     drop_last=False,
     sampler=dict(type='DefaultSampler', shuffle=False),
     dataset=dict(
@@ -1339,11 +1339,13 @@ class MosaicKeypoints(Mosaic):
 
             # TODO: kps adjust coordinate
             gt_keypoints_i = results_patch['gt_keypoints']
-            gt_keypoints_i = Keypoints._kpt_rescale(gt_keypoints_i,[scale_ratio_i, scale_ratio_i])
-            gt_keypoints_i = Keypoints._kpt_translate(gt_keypoints_i,[padw, padh])
-            mosaic_keypoints.append(gt_keypoints_i)
-
             gt_keypoints_visible_i = results_patch['gt_keypoints_visible']
+            gt_keypoints_i, gt_keypoints_visible_i = \
+                Keypoints._kpt_rescale_translate_clip(
+                    gt_keypoints_i, gt_keypoints_visible_i,
+                    [scale_ratio_i, scale_ratio_i], [padw, padh],
+                    [2 * img_scale_h, 2 * img_scale_w])
+            mosaic_keypoints.append(gt_keypoints_i)
             mosaic_keypoints_visible.append(gt_keypoints_visible_i)
 
         mosaic_bboxes = mosaic_bboxes[0].cat(mosaic_bboxes, 0)
@@ -1353,8 +1355,6 @@ class MosaicKeypoints(Mosaic):
         mosaic_keypoints = np.concatenate(mosaic_keypoints, 0)
         mosaic_keypoints_visible = np.concatenate(mosaic_keypoints_visible, 0)
 
-        mosaic_keypoints_visible = Keypoints._kpt_clip(mosaic_keypoints, mosaic_keypoints_visible, [2 * img_scale_h, 2 * img_scale_w])
-
         if self.bbox_clip_border:
             mosaic_bboxes.clip_([2 * img_scale_h, 2 * img_scale_w])
         else:
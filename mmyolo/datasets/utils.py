@@ -1,4 +1,6 @@
 # Copyright (c) OpenMMLab. All rights reserved.
+from functools import lru_cache
+from operator import itemgetter
 from typing import List, Sequence, Tuple, Union
 
 import numpy as np
@@ -6,44 +8,56 @@ import torch
 from mmengine.dataset import COLLATE_FUNCTIONS
 from mmpose.datasets.datasets.utils import parse_pose_metainfo
 from mmpose.structures.keypoint.transforms import flip_keypoints
-from mmpose.evaluation.functional.nms import oks_iou
 
 from ..registry import TASK_UTILS
 
+# torch.aminmax is only available from torch 1.11
+_HAS_AMINMAX = hasattr(torch, 'aminmax')
+
 
 @COLLATE_FUNCTIONS.register_module()
 def yolov5_collate(data_batch: Sequence,
-                   use_ms_training: bool = False) -> dict:
+                   use_ms_training: bool = False,
+                   channels_last: bool = False) -> dict:
     """Rewrite collate_fn to get faster training speed.
 
     Args:
        data_batch (Sequence): Batch of data.
        use_ms_training (bool): Whether to use multi-scale training.
+       channels_last (bool): Whether to return the stacked images in
+           ``torch.channels_last`` (NHWC) memory format. The model should
+           be converted with ``model.to(memory_format=torch.channels_last)``
+           as well to benefit from it. Ignored when ``use_ms_training`` is
+           True. Defaults to False.
     """
     batch_imgs = []
-    batch_bboxes_labels = []
-    for i in range(len(data_batch)):
-        datasamples = data_batch[i]['data_samples']
-        inputs = data_batch[i]['inputs']
-
-        gt_bboxes = datasamples.gt_instances.bboxes.tensor
-        gt_labels = datasamples.gt_instances.labels
-        batch_idx = gt_labels.new_full((len(gt_labels), 1), i)
-        bboxes_labels = torch.cat((batch_idx, gt_labels[:, None], gt_bboxes),
-                                  dim=1)
-        batch_bboxes_labels.append(bboxes_labels)
-
-        batch_imgs.append(inputs)
+    batch_labels = []
+    batch_bboxes = []
+    for data in data_batch:
+        gt_instances = data['data_samples'].gt_instances
+        batch_labels.append(gt_instances.labels)
+        batch_bboxes.append(gt_instances.bboxes.tensor)
+        batch_imgs.append(data['inputs'])
+
+    # Fill a single preallocated (num_gts, 6) buffer of
+    # [batch_idx, label, x1, y1, x2, y2] with one write per column, so the
+    # tensor op count does not grow with the batch size.
+    num_gts_per_img = torch.tensor([len(labels) for labels in batch_labels],
+                                   dtype=torch.long)
+    batch_bboxes_labels = torch.empty((int(num_gts_per_img.sum()), 6),
+                                      dtype=torch.float32)
+    batch_bboxes_labels[:, 0] = torch.arange(
+        len(data_batch)).repeat_interleave(num_gts_per_img)
+    batch_bboxes_labels[:, 1] = torch.cat(batch_labels)
+    batch_bboxes_labels[:, 2:] = torch.cat(batch_bboxes)
+
     if use_ms_training:
-        return {
-            'inputs': batch_imgs,
-            'data_samples': torch.cat(batch_bboxes_labels, 0)
-        }
-    else:
-        return {
-            'inputs': torch.stack(batch_imgs, 0),
-            'data_samples': torch.cat(batch_bboxes_labels, 0)
-        }
+        return {'inputs': batch_imgs, 'data_samples': batch_bboxes_labels}
+
+    batch_imgs = torch.stack(batch_imgs, 0)
+    if channels_last:
+        batch_imgs = batch_imgs.contiguous(memory_format=torch.channels_last)
+    return {'inputs': batch_imgs, 'data_samples': batch_bboxes_labels}
 
 
 @TASK_UTILS.register_module()
@@ -71,37 +85,46 @@ class BatchShapePolicy:
         self.extra_pad_ratio = extra_pad_ratio
 
     def __call__(self, data_list: List[dict]) -> List[dict]:
-        image_shapes = []
-        for data_info in data_list:
-            image_shapes.append((data_info['width'], data_info['height']))
-
-        image_shapes = np.array(image_shapes, dtype=np.float64)
-
-        n = len(image_shapes)  # number of images
-        batch_index = np.floor(np.arange(n) / self.batch_size).astype(
-            np.int64)  # batch index
+        n = len(data_list)  # number of images
+        widths = np.fromiter((data_info['width'] for data_info in data_list),
+                             dtype=np.float64,
+                             count=n)
+        heights = np.fromiter(
+            (data_info['height'] for data_info in data_list),
+            dtype=np.float64,
+            count=n)
+
+        batch_index = np.arange(n) // self.batch_size  # batch index
         number_of_batches = batch_index[-1] + 1  # number of batches
 
-        aspect_ratio = image_shapes[:, 1] / image_shapes[:, 0]  # aspect ratio
-        irect = aspect_ratio.argsort()
+        aspect_ratio = heights / widths  # aspect ratio
+        irect = aspect_ratio.argsort(kind='stable')
 
-        data_list = [data_list[i] for i in irect]
+        # skip the reorder if the data list is already sorted by ratio
+        if not np.array_equal(irect, np.arange(n)):
+            data_list = list(itemgetter(*irect.tolist())(data_list))
+            aspect_ratio = aspect_ratio[irect]
 
-        aspect_ratio = aspect_ratio[irect]
         # Set training image shapes
-        shapes = [[1, 1]] * number_of_batches
-        for i in range(number_of_batches):
-            aspect_ratio_index = aspect_ratio[batch_index == i]
-            min_index, max_index = aspect_ratio_index.min(
-            ), aspect_ratio_index.max()
-            if max_index < 1:
-                shapes[i] = [max_index, 1]
-            elif min_index > 1:
-                shapes[i] = [1, 1 / min_index]
-
-        batch_shapes = np.ceil(
-            np.array(shapes) * self.img_size / self.size_divisor +
-            self.extra_pad_ratio).astype(np.int64) * self.size_divisor
+        # Batches are contiguous runs of the sorted ratios, so the min and
+        # max of each batch are its first and last elements.
+        batch_starts = np.arange(0, n, self.batch_size)
+        batch_ends = np.minimum(batch_starts + self.batch_size, n)
+        min_ratio = aspect_ratio[batch_starts]
+        max_ratio = aspect_ratio[batch_ends - 1]
+        shapes = np.ones((number_of_batches, 2), dtype=np.float64)
+        shapes[:, 0] = np.where(max_ratio < 1, max_ratio, 1)
+        shapes[:, 1] = np.where((max_ratio >= 1) & (min_ratio > 1),
+                                1 / min_ratio, 1)
+
+        # Round up to a multiple of size_divisor in place on the shape
+        # table. np.ceil is kept, since an integer ``int(x) + 1`` round-up
+        # differs from it whenever x is already integral.
+        shapes *= self.img_size
+        shapes /= self.size_divisor
+        shapes += self.extra_pad_ratio
+        batch_shapes = np.ceil(shapes, out=shapes).astype(np.int64)
+        batch_shapes *= self.size_divisor
 
         for i, data_info in enumerate(data_list):
             data_info['batch_shape'] = batch_shapes[batch_index[i]]
@@ -109,12 +132,44 @@ class BatchShapePolicy:
         return data_list
 
 
+@lru_cache(maxsize=None)
+def get_pose_metainfo(from_file: str) -> dict:
+    """Parse the pose dataset meta information of ``from_file`` once.
+
+    The parsed result is cached per file path, so the dataset, loss, metric
+    and ``Keypoints`` share a single parse per process. The returned dict is
+    shared and should not be modified in place.
+
+    Args:
+        from_file (str): Path of the pose dataset info config.
+
+    Returns:
+        dict: Parsed meta information, see
+        ``mmpose.datasets.datasets.utils.parse_pose_metainfo``.
+    """
+    return parse_pose_metainfo(dict(from_file=from_file))
+
+
 class Keypoints:
     METAINFO: dict = dict(from_file='configs/_base_/datasets/coco.py')
-    metainfo = parse_pose_metainfo(METAINFO)
+    metainfo = get_pose_metainfo(METAINFO['from_file'])
+    _FLIP_INDICES = np.array(metainfo['flip_indices'], dtype=np.int64)
+
+    @staticmethod
+    def _xy_like(kpt, values: Tuple[float, float]):
+        """Wrap per-axis ``(x, y)`` values so that they broadcast over the
+        last dim of ``kpt``, as a tensor or an array like ``kpt``.
 
-    @classmethod
-    def _kpt_rescale(self, kpt, scale_factor: Tuple[float, float]):
+        The values are not cast to an integer ``kpt`` dtype, so the result
+        of an op with them follows the usual type promotion.
+        """
+        if isinstance(kpt, torch.Tensor):
+            dtype = kpt.dtype if kpt.is_floating_point() else None
+            return torch.as_tensor(values, dtype=dtype, device=kpt.device)
+        return np.asarray(values)
+
+    @staticmethod
+    def _kpt_rescale(kpt, scale_factor: Tuple[float, float]):
         """Rescale the keypoints according to the scale factor.
 
         Args:
@@ -126,12 +181,11 @@ class Keypoints:
         """
         assert len(scale_factor) == 2
         assert kpt.shape[-1] == 2
-        kpt[..., 0] = kpt[..., 0] * scale_factor[0]
-        kpt[..., 1] = kpt[..., 1] * scale_factor[1]
+        kpt[...] = kpt * Keypoints._xy_like(kpt, scale_factor)
         return kpt
 
-    @classmethod
-    def _kpt_translate(self, kpt, distances: Tuple[float, float]):
+    @staticmethod
+    def _kpt_translate(kpt, distances: Tuple[float, float]):
         """Translate the keypoints according to the given distances.
 
         Args:
@@ -143,12 +197,11 @@ class Keypoints:
         """
         assert len(distances) == 2
         assert kpt.shape[-1] == 2
-        kpt[..., 0] = kpt[..., 0] + distances[0]
-        kpt[..., 1] = kpt[..., 1] + distances[1]
+        kpt[...] = kpt + Keypoints._xy_like(kpt, distances)
         return kpt
 
-    @classmethod
-    def _kpt_clip(self, kpt, kpt_vis, img_shape: Tuple[int, int]) -> None:
+    @staticmethod
+    def _kpt_clip(kpt, kpt_vis, img_shape: Tuple[int, int]) -> None:
         """Clip the keypoints, only change the visibility of the keypoints, not the coordinates.
 
         Args:
@@ -160,23 +213,52 @@ class Keypoints:
         assert kpt.shape[-1] == 2
         assert len(kpt_vis.shape) == 2
         # keypoints outside the image are not allowed
-        flags = self._kpt_is_inside(kpt, img_shape, all_inside=False)
+        flags = Keypoints._kpt_is_inside(kpt, img_shape)
         # set visibility to 0 if the keypoint is outside the image
         kpt_vis[~flags] = 0
         return kpt_vis
 
-    @classmethod
-    def _kpt_is_inside(self,
-                       kpt,
+    @staticmethod
+    def _kpt_rescale_translate_clip(kpt, kpt_vis,
+                                    scale_factor: Tuple[float, float],
+                                    distances: Tuple[float, float],
+                                    img_shape: Tuple[int, int]):
+        """Rescale, translate and clip the keypoints.
+
+        Equivalent to ``_kpt_rescale``, ``_kpt_translate`` and ``_kpt_clip``
+        in sequence, but writes the coordinates with a single multiply-add
+        and clears the visibility of out-of-image points with one mask.
+
+        Args:
+            kpt (np.ndarray): Keypoints to be transformed. N x K x 2
+            kpt_vis (np.ndarray): Visibility of the keypoints. N x K
+            scale_factor (tuple[float]): Scale factor. (r1, r2)
+            distances (tuple[float]): Distances to translate.
+            img_shape (tuple[int]): Shape of the image to clip to.
+
+        Returns:
+            tuple[np.ndarray]: Transformed keypoints and their visibility.
+        """
+        assert len(scale_factor) == 2
+        assert len(distances) == 2
+        assert kpt.shape[-1] == 2
+        assert len(kpt_vis.shape) == 2
+        kpt[...] = kpt * Keypoints._xy_like(kpt, scale_factor) + \
+            Keypoints._xy_like(kpt, distances)
+        kpt_vis[~Keypoints._kpt_is_inside(kpt, img_shape)] = 0
+        return kpt, kpt_vis
+
+    @staticmethod
+    def _kpt_is_inside(kpt,
                        img_shape: Tuple[int, int],
-                       all_inside: bool = False,
                        allowed_border: int = 0):
         """Check if the keypoints are inside the image.
 
+        A keypoint is inside only if it satisfies all four borders.
+
         Args:
             kpt (np.ndarray): Keypoints to be checked.
             img_shape (tuple[int]): Shape of the image.
-            all_inside (bool): Whether all keypoints should be inside the image.
             allowed_border (int): The border to allow for the keypoints.
 
         Returns:
@@ -185,62 +267,39 @@ class Keypoints:
         """
         assert len(img_shape) == 2
         assert kpt.shape[-1] == 2
-        if all_inside:
-            flags = np.all((kpt[..., 0] >= allowed_border,
-                            kpt[..., 0] < img_shape[1] - allowed_border,
-                            kpt[..., 1] >= allowed_border,
-                            kpt[..., 1] < img_shape[0] - allowed_border),
-                           axis=0)
-        else:
-            flags = np.any((kpt[..., 0] >= allowed_border,
-                            kpt[..., 0] < img_shape[1] - allowed_border,
-                            kpt[..., 1] >= allowed_border,
-                            kpt[..., 1] < img_shape[0] - allowed_border),
-                           axis=0)
-        return flags
-
-    @classmethod
-    def _affine_transform_pts(self, x, y, matrix):
-        """Affine transformation for points.
-
-        Args:
-            x (np.ndarray): x coordinates of points.
-            y (np.ndarray): y coordinates of points.
-            matrix (np.ndarray): Affine transformation matrix.
-
-        Returns:
-            tuple[np.ndarray]: Transformed x and y coordinates.
-        """
-        x_t = matrix[0, 0] * x + matrix[0, 1] * y + matrix[0, 2]
-        y_t = matrix[1, 0] * x + matrix[1, 1] * y + matrix[1, 2]
-        return x_t, y_t
-
-    @classmethod
+        # Compare the interleaved (x, y) pairs against per-axis bounds in
+        # contiguous passes instead of on strided x and y views.
+        upper = np.array([img_shape[1], img_shape[0]]) - allowed_border
+        flags = kpt >= allowed_border
+        np.logical_and(flags, kpt < upper, out=flags)
+        return flags.all(axis=-1)
+
+    @staticmethod
     def _kpt_project(
-            self, kpt, homography_matrix: Union[torch.Tensor,
-                                                np.ndarray]) -> None:
+            kpt, homography_matrix: Union[torch.Tensor, np.ndarray]) -> None:
         """Project the keypoints according to the homography matrix.
 
+        Only the affine part of ``homography_matrix`` is applied.
+
         Args:
             kpt (np.ndarray): Keypoints to be projected, in shape (N, K, 2).
             homography_matrix (torch.Tensor | np.ndarray): Homography matrix.
         """
         assert kpt.shape[-1] == 2
-        kpt[..., 0::3], kpt[..., 1::3] = self._affine_transform_pts(
-            kpt[..., 0::3], kpt[..., 1::3], homography_matrix)
+        matrix = np.asarray(homography_matrix)
+        # one (N * K, 2) x (2, 2) matmul plus translation
+        kpt[:] = kpt @ matrix[:2, :2].T + matrix[:2, 2]
         return kpt
 
-    @classmethod
-    def _kpt_flip(self, kpt, kpt_vis, img_shape: Tuple[int, int], direction) -> None:
+    @staticmethod
+    def _kpt_flip(kpt, kpt_vis, img_shape: Tuple[int, int], direction) -> None:
         # default meta info for coco
-        flip_indices = self.metainfo['flip_indices']
-        kpt, kpt_vis = flip_keypoints(kpt, kpt_vis,
-                                                  img_shape, flip_indices,
-                                                  direction)
+        kpt, kpt_vis = flip_keypoints(kpt, kpt_vis, img_shape,
+                                      Keypoints._FLIP_INDICES, direction)
         return kpt, kpt_vis
 
-    @classmethod
-    def _kpt_area(self, kpt):
+    @staticmethod
+    def _kpt_area(kpt):
         """
         _kpt_area keypoints' rectangle's area.
 
@@ -252,8 +311,11 @@ class Keypoints:
         assert kpt.dim() == 3
         assert kpt.shape[-1] == 2 or kpt.shape[-1] == 3
         kpt = kpt[..., :2]
-        x_min = kpt[..., 0].min(dim=-1)[0]
-        x_max = kpt[..., 0].max(dim=-1)[0]
-        y_min = kpt[..., 1].min(dim=-1)[0]
-        y_max = kpt[..., 1].max(dim=-1)[0]
-        return (x_max - x_min) * (y_max - y_min)
+        # reduce x and y over the keypoint dim together, in a single pass
+        # when torch.aminmax is available
+        if _HAS_AMINMAX:
+            kpt_min, kpt_max = torch.aminmax(kpt, dim=-2)
+        else:
+            kpt_min, kpt_max = kpt.min(dim=-2)[0], kpt.max(dim=-2)[0]
+        wh = kpt_max - kpt_min
+        return wh[..., 0] * wh[..., 1]
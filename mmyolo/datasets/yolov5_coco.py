@@ -1,11 +1,11 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import os.path as osp
 from typing import Any, List, Optional, Union
-from mmpose.datasets.datasets.utils import parse_pose_metainfo
 from mmdet.datasets import BaseDetDataset, CocoDataset
 import numpy as np
 
 from ..registry import DATASETS, TASK_UTILS
+from .utils import get_pose_metainfo
 
 
 class BatchShapePolicyDataset(BaseDetDataset):
@@ -76,10 +76,21 @@ class YOLOv5PoseCocoDataset(BatchShapePolicyDataset, CocoDataset):
     """
     def __init__(self, metainfo, *args, batch_shapes_cfg: Optional[dict] = None, **kwargs):
         super().__init__(*args, batch_shapes_cfg=batch_shapes_cfg, **kwargs)
-        METAINFO: dict = dict(from_file=metainfo)
-        pose_metainfo = parse_pose_metainfo(METAINFO)
+        pose_metainfo = get_pose_metainfo(metainfo)
         self.METAINFO = self.METAINFO.update(pose_metainfo)
 
+    def __getstate__(self) -> dict:
+        """Drop ``cat_img_map`` when pickling the dataset, e.g. into
+        dataloader workers started with ``spawn``.
+
+        ``cat_img_map`` is only used by ``filter_data``, which has run once
+        the dataset is fully initialized, so workers never need it.
+        """
+        state = self.__dict__.copy()
+        if self._fully_initialized:
+            state.pop('cat_img_map', None)
+        return state
+
     def parse_data_info(self, raw_data_info: dict) -> Union[dict, List[dict]]:
         """Parse raw annotation to target format.
 
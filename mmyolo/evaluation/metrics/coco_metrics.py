@@ -11,12 +11,12 @@ from mmengine.fileio import FileClient, dump, load
 from mmengine.logging import MMLogger
 from mmpose.evaluation.functional import oks_nms, soft_oks_nms
 from mmpose.evaluation.metrics.coco_metric import CocoMetric as MMPosCocoMetric
-from mmpose.datasets.datasets.utils import parse_pose_metainfo
 from terminaltables import AsciiTable
 from xtcocotools.coco import COCO
 from xtcocotools.cocoeval import COCOeval
 
 
+from mmyolo.datasets.utils import get_pose_metainfo
 from mmyolo.registry import METRICS
 
 
@@ -29,7 +29,7 @@ class CocoMetric(MMPosCocoMetric):
 
     @dataset_meta.setter
     def dataset_meta(self, dataset_meta) -> Optional[dict]:
-        self._dataset_meta = parse_pose_metainfo(dict(from_file="../configs/coco.py"))
+        self._dataset_meta = get_pose_metainfo("../configs/coco.py")
 
     def process(self, data_batch: Sequence[dict],
                 data_samples: Sequence[dict]) -> None:
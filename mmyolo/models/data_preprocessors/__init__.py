@@ -3,9 +3,11 @@ from .data_preprocessor import (PPYOLOEBatchRandomResize,
                                 PPYOLOEDetDataPreprocessor,
                                 YOLOv5DetDataPreprocessor,
                                 YOLOXBatchSyncRandomResize,
-                                YOLOXPoseBatchSyncRandomResize)
+                                YOLOXPoseBatchSyncRandomResize,
+                                YOLOXPoseDetDataPreprocessor)
 
 __all__ = [
     'YOLOv5DetDataPreprocessor', 'PPYOLOEDetDataPreprocessor',
-    'PPYOLOEBatchRandomResize', 'YOLOXBatchSyncRandomResize', 'YOLOXPoseBatchSyncRandomResize'
+    'PPYOLOEBatchRandomResize', 'YOLOXBatchSyncRandomResize', 'YOLOXPoseBatchSyncRandomResize',
+    'YOLOXPoseDetDataPreprocessor'
 ]
@@ -1,4 +1,5 @@
 # Copyright (c) OpenMMLab. All rights reserved.
+import math
 import random
 from typing import List, Tuple, Union
 
@@ -6,6 +7,7 @@ import torch
 import torch.nn.functional as F
 from mmdet.models import BatchSyncRandomResize
 from mmdet.models.data_preprocessors import DetDataPreprocessor
+from mmdet.models.utils.misc import samplelist_boxtype2tensor
 from mmengine import MessageHub, is_list_of
 from torch import Tensor
 
@@ -153,6 +155,9 @@ class YOLOv5DetDataPreprocessor(DetDataPreprocessor):
 
         if self._channel_conversion and inputs.shape[1] == 3:
             inputs = inputs[:, [2, 1, 0], ...]
+        # Images are collated as uint8 to cut the host-to-device copy, so
+        # convert to float on device after channel conversion.
+        inputs = inputs.float()
 
         if self._enable_normalize:
             inputs = (inputs - self.mean) / self.std
@@ -169,6 +174,93 @@ class YOLOv5DetDataPreprocessor(DetDataPreprocessor):
         return {'inputs': inputs, 'data_samples': data_samples}
 
 
+@MODELS.register_module()
+class YOLOXPoseDetDataPreprocessor(DetDataPreprocessor):
+    """Image pre-processor for YOLOX pose that can pad batches to square.
+
+    With ``pad_to_square=True`` every batch is padded at the bottom-right to
+    a square whose side is the longest image side in the batch rounded up to
+    ``pad_size_divisor``, filled with ``pad_value``. This replaces a
+    ``mmdet.Pad(pad_to_square=True)`` step in the data pipeline, so the
+    padding runs on the device instead of in every dataloader worker.
+    Bottom-right padding does not shift the boxes or keypoints.
+
+    Like ``mmdet.Pad``, square padding fills the raw pixels, i.e. it is
+    applied before normalization and ``pad_value`` is a raw pixel value.
+
+    Args:
+        pad_to_square (bool): Whether to pad each batch to a square.
+            Defaults to False.
+        non_blocking (bool): Whether to copy the data to the device
+            asynchronously, which pays off with ``pin_memory=True`` in the
+            dataloader. Set here rather than forwarded to
+            ``DetDataPreprocessor``, which only accepts it from mmdet 3.0.0rc6.
+            Defaults to False.
+    """
+
+    def __init__(self,
+                 *args,
+                 pad_to_square: bool = False,
+                 non_blocking: bool = False,
+                 **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pad_to_square = pad_to_square
+        self._non_blocking = non_blocking
+
+    def forward(self, data: dict, training: bool = False) -> dict:
+        """Perform normalization, square padding and bgr2rgb conversion
+        based on ``DetDataPreprocessor``.
+
+        Args:
+            data (dict): Data sampled from dataloader.
+            training (bool): Whether to enable training time augmentation.
+
+        Returns:
+            dict: Data in the same format as the model input.
+        """
+        if not self.pad_to_square:
+            return super().forward(data, training)
+
+        data = self.cast_data(data)
+        _batch_inputs, data_samples = data['inputs'], data.get('data_samples')
+        assert is_list_of(_batch_inputs, torch.Tensor), \
+            '"inputs" should be a list of Tensor, but got ' \
+            f'{type(_batch_inputs)}.'
+
+        batch_inputs = []
+        for _batch_input in _batch_inputs:
+            if self._channel_conversion and _batch_input.shape[0] == 3:
+                _batch_input = _batch_input[[2, 1, 0], ...]
+            batch_inputs.append(_batch_input.float())
+
+        max_size = max(max(img.shape[-2:]) for img in batch_inputs)
+        size = int(
+            math.ceil(max_size / self.pad_size_divisor) *
+            self.pad_size_divisor)
+        inputs = torch.stack([
+            F.pad(
+                img, (0, size - img.shape[-1], 0, size - img.shape[-2]),
+                value=self.pad_value) for img in batch_inputs
+        ])
+        if self._enable_normalize:
+            inputs = (inputs - self.mean) / self.std
+
+        if data_samples is not None:
+            for data_sample in data_samples:
+                data_sample.set_metainfo({
+                    'batch_input_shape': (size, size),
+                    'pad_shape': (size, size)
+                })
+            if self.boxtype2tensor:
+                samplelist_boxtype2tensor(data_samples)
+
+        if training and self.batch_augments is not None:
+            for batch_aug in self.batch_augments:
+                inputs, data_samples = batch_aug(inputs, data_samples)
+
+        return {'inputs': inputs, 'data_samples': data_samples}
+
+
 @MODELS.register_module()
 class PPYOLOEDetDataPreprocessor(DetDataPreprocessor):
     """Image pre-processor for detection tasks.
@@ -4,10 +4,8 @@ from typing import Optional, Tuple, Union
 import torch
 import torch.nn as nn
 import numpy as np
-from mmpose.evaluation.functional.nms import oks_iou
-from mmpose.datasets.datasets.utils import parse_pose_metainfo
 from torch import Tensor
-from mmyolo.datasets.utils import Keypoints
+from mmyolo.datasets.utils import Keypoints, get_pose_metainfo
 from mmyolo.registry import MODELS
 from einops import rearrange, reduce, repeat
 from mmpose.models.losses import SmoothL1Loss
@@ -23,8 +21,7 @@ class OksLoss(nn.Module):
         if isinstance(dataset_info, dict):
             self.dataset_info = dataset_info
         if isinstance(dataset_info, str):
-            _metainfo = dict(from_file=dataset_info)
-            self.dataset_info = parse_pose_metainfo(_metainfo)
+            self.dataset_info = get_pose_metainfo(dataset_info)
         else:
             raise TypeError('dataset_info must be a dict or a str')
         self.oks_type = loss_type
@@ -7,7 +7,7 @@ from mmdet.structures import DetDataSample
 from mmdet.structures.bbox import HorizontalBoxes
 from mmengine.structures import InstanceData
 
-from mmyolo.datasets import BatchShapePolicy, yolov5_collate
+from mmyolo.datasets import BatchShapePolicy, Keypoints, yolov5_collate
 
 
 def _rand_bboxes(rng, num_boxes, w, h):
@@ -47,6 +47,26 @@ class TestYOLOv5Collate(unittest.TestCase):
         self.assertTrue(out['inputs'].shape == (2, 3, 10, 10))
         self.assertTrue(out['data_samples'].shape == (8, 6))
 
+    def test_yolov5_collate_channels_last(self):
+        rng = np.random.RandomState(0)
+
+        inputs = torch.randn((3, 10, 10))
+        data_samples = DetDataSample()
+        gt_instances = InstanceData()
+        bboxes = _rand_bboxes(rng, 4, 6, 8)
+        gt_instances.bboxes = HorizontalBoxes(bboxes, dtype=torch.float32)
+        labels = rng.randint(1, 2, size=len(bboxes))
+        gt_instances.labels = torch.LongTensor(labels)
+        data_samples.gt_instances = gt_instances
+
+        out = yolov5_collate(
+            [dict(inputs=inputs, data_samples=data_samples)] * 2,
+            channels_last=True)
+        self.assertTrue(out['inputs'].shape == (2, 3, 10, 10))
+        self.assertTrue(out['inputs'].is_contiguous(
+            memory_format=torch.channels_last))
+        self.assertTrue(torch.equal(out['inputs'][1], inputs))
+
     def test_yolov5_collate_with_multi_scale(self):
         rng = np.random.RandomState(0)
 
@@ -131,3 +151,117 @@ class TestBatchShapePolicy(unittest.TestCase):
             self.assertTrue(
                 np.allclose(expected_data_infos[i]['batch_shape'],
                             out_data_infos[i]['batch_shape']))
+
+    def test_batch_shape_policy_stable_order(self):
+        # images with equal aspect ratios keep their original order; with
+        # more than 16 ties the default quicksort would reorder them
+        src_data_infos = [{
+            'id': i,
+            'height': h,
+            'width': 100
+        } for i, h in enumerate([30, 10] * 20)]
+        out_data_infos = BatchShapePolicy(batch_size=4)(src_data_infos)
+        self.assertEqual([info['id'] for info in out_data_infos],
+                         list(range(1, 40, 2)) + list(range(0, 40, 2)))
+        for i, info in enumerate(out_data_infos):
+            expected = [96, 672] if i < 20 else [224, 672]
+            self.assertEqual(info['batch_shape'].tolist(), expected)
+
+        # an already sorted data list is kept as is
+        src_data_infos = [{
+            'id': i,
+            'height': h,
+            'width': 100
+        } for i, h in enumerate([10, 10, 20, 30, 30])]
+        out_data_infos = BatchShapePolicy(batch_size=2)(src_data_infos)
+        self.assertIs(out_data_infos, src_data_infos)
+        self.assertEqual(
+            [info['batch_shape'].tolist() for info in out_data_infos],
+            [[96, 672], [96, 672], [224, 672], [224, 672], [224, 672]])
+
+
+class TestKeypoints(unittest.TestCase):
+
+    def test_kpt_rescale_translate(self):
+        kpt = np.array([[[10, 20]]], dtype=np.float32)
+        kpt = Keypoints._kpt_rescale(kpt, [0.5, 2])
+        self.assertTrue(np.allclose(kpt, [[[5, 40]]]))
+        kpt = Keypoints._kpt_translate(kpt, [1.5, -2])
+        self.assertTrue(np.allclose(kpt, [[[6.5, 38]]]))
+
+        # integer keypoints are not truncated before the op
+        kpt = Keypoints._kpt_rescale(np.array([[[10, 20]]]), [0.5, 0.5])
+        self.assertTrue(np.array_equal(kpt, [[[5, 10]]]))
+
+        kpt = Keypoints._kpt_rescale(torch.tensor([[[10., 20.]]]), [0.5, 2])
+        self.assertTrue(torch.allclose(kpt, torch.tensor([[[5., 40.]]])))
+
+    def test_kpt_rescale_translate_clip(self):
+        rng = np.random.RandomState(0)
+        kpt = rng.uniform(-20, 60, size=(4, 17, 2))
+        kpt_vis = rng.randint(0, 3, size=(4, 17)).astype(np.float32)
+
+        expected_kpt = Keypoints._kpt_rescale(kpt.copy(), [0.75, 1.5])
+        expected_kpt = Keypoints._kpt_translate(expected_kpt, [-3, 7])
+        expected_vis = Keypoints._kpt_clip(expected_kpt, kpt_vis.copy(),
+                                           (40, 50))
+
+        out_kpt, out_vis = Keypoints._kpt_rescale_translate_clip(
+            kpt, kpt_vis, [0.75, 1.5], [-3, 7], (40, 50))
+        self.assertTrue(np.allclose(out_kpt, expected_kpt))
+        self.assertTrue(np.array_equal(out_vis, expected_vis))
+        # updated in place
+        self.assertIs(out_kpt, kpt)
+        self.assertIs(out_vis, kpt_vis)
+
+    def test_kpt_is_inside(self):
+        # (x, y) in an image of height 10 and width 20
+        kpt = np.array([[[5, 5], [-1, 5], [5, 10], [19, 9], [25, -3]]],
+                       dtype=np.float32)
+        flags = Keypoints._kpt_is_inside(kpt, (10, 20))
+        self.assertEqual(flags.shape, (1, 5))
+        self.assertTrue(
+            np.array_equal(flags, [[True, False, False, True, False]]))
+
+        flags = Keypoints._kpt_is_inside(kpt, (10, 20), allowed_border=1)
+        self.assertTrue(
+            np.array_equal(flags, [[True, False, False, False, False]]))
+
+    def test_kpt_clip(self):
+        kpt = np.array([[[5, 5], [-1, 5], [5, 10]]], dtype=np.float32)
+        kpt_vis = np.ones((1, 3), dtype=np.float32)
+        kpt_vis = Keypoints._kpt_clip(kpt, kpt_vis, (10, 20))
+        self.assertTrue(np.array_equal(kpt_vis, [[1, 0, 0]]))
+        # coordinates are left untouched
+        self.assertTrue(np.array_equal(kpt, [[[5, 5], [-1, 5], [5, 10]]]))
+
+    def test_kpt_project(self):
+        kpt = np.array([[[1, 2], [3, 4]]], dtype=np.float32)
+        # scale x by 2, y by 3, then translate by (10, 20)
+        matrix = np.array([[2, 0, 10], [0, 3, 20], [0, 0, 1]],
+                          dtype=np.float32)
+        kpt = Keypoints._kpt_project(kpt, matrix)
+        self.assertTrue(np.allclose(kpt, [[[12, 26], [16, 32]]]))
+
+        # the matrix is not truncated to an integer keypoint dtype
+        kpt = np.array([[[4, 8]]])
+        matrix = np.array([[0.75, 0, 0], [0, 0.5, 1.5], [0, 0, 1]])
+        kpt = Keypoints._kpt_project(kpt, matrix)
+        self.assertTrue(np.array_equal(kpt, [[[3, 5]]]))
+
+    def test_kpt_area(self):
+        torch.manual_seed(0)
+        for dim in (2, 3):
+            kpt = torch.rand(4, 17, dim) * 100
+            xy = kpt[..., :2]
+            expected = (xy[..., 0].max(dim=-1)[0] -
+                        xy[..., 0].min(dim=-1)[0]) * (
+                            xy[..., 1].max(dim=-1)[0] -
+                            xy[..., 1].min(dim=-1)[0])
+            area = Keypoints._kpt_area(kpt)
+            self.assertEqual(area.shape, (4, ))
+            self.assertTrue(torch.allclose(area, expected))
+
+        kpt = torch.tensor([[[1., 2.], [4., 0.], [3., 6.]]])
+        self.assertTrue(
+            torch.equal(Keypoints._kpt_area(kpt), torch.tensor([18.])))
@@ -1,7 +1,8 @@
 # Copyright (c) OpenMMLab. All rights reserved.
+import pickle
 import unittest
 
-from mmyolo.datasets import YOLOv5CocoDataset
+from mmyolo.datasets import YOLOv5CocoDataset, YOLOv5PoseCocoDataset
 
 
 class TestYOLOv5CocoDataset(unittest.TestCase):
@@ -69,3 +70,23 @@ class TestYOLOv5CocoDataset(unittest.TestCase):
 
         for data in dataset:
             assert 'dataset' not in data
+
+
+class TestYOLOv5PoseCocoDataset(unittest.TestCase):
+
+    def test_pickle(self):
+        dataset = YOLOv5PoseCocoDataset(
+            'configs/_base_/datasets/coco.py',
+            data_prefix=dict(img='imgs'),
+            ann_file='tests/data/coco_sample.json',
+            filter_cfg=dict(filter_empty_gt=False, min_size=0),
+            pipeline=[],
+            serialize_data=True)
+        self.assertTrue(hasattr(dataset, 'cat_img_map'))
+
+        restored = pickle.loads(pickle.dumps(dataset))
+        self.assertFalse(hasattr(restored, 'cat_img_map'))
+        self.assertEqual(len(restored), len(dataset))
+        for i in range(len(dataset)):
+            self.assertEqual(restored.get_data_info(i)['img_id'],
+                             dataset.get_data_info(i)['img_id'])
@@ -6,7 +6,8 @@ from mmdet.structures import DetDataSample
 from mmengine import MessageHub
 
 from mmyolo.models import PPYOLOEBatchRandomResize, PPYOLOEDetDataPreprocessor
-from mmyolo.models.data_preprocessors import YOLOv5DetDataPreprocessor
+from mmyolo.models.data_preprocessors import (YOLOv5DetDataPreprocessor,
+                                              YOLOXPoseDetDataPreprocessor)
 from mmyolo.utils import register_all_modules
 
 register_all_modules()
@@ -122,3 +123,61 @@ class TestPPYOLOEDetDataPreprocessor(TestCase):
         # data_samples must be list
         with self.assertRaises(TypeError):
             processor(data, training=True)
+
+
+class TestYOLOXPoseDetDataPreprocessor(TestCase):
+
+    def test_forward(self):
+        data = {
+            'inputs': [
+                torch.randint(0, 256, (3, 40, 20), dtype=torch.uint8),
+                torch.randint(0, 256, (3, 10, 30), dtype=torch.uint8)
+            ],
+            'data_samples': [DetDataSample(), DetDataSample()]
+        }
+
+        # without pad_to_square it behaves like DetDataPreprocessor
+        processor = YOLOXPoseDetDataPreprocessor(pad_size_divisor=32)
+        out_data = processor(data, training=False)
+        self.assertEqual(out_data['inputs'].shape, (2, 3, 64, 32))
+        self.assertFalse(processor._non_blocking)
+
+        processor = YOLOXPoseDetDataPreprocessor(
+            pad_size_divisor=32,
+            pad_to_square=True,
+            pad_value=114,
+            non_blocking=True)
+        self.assertTrue(processor._non_blocking)
+        out_data = processor(data, training=False)
+        batch_inputs, batch_data_samples = out_data['inputs'], out_data[
+            'data_samples']
+        self.assertEqual(batch_inputs.shape, (2, 3, 64, 64))
+        self.assertEqual(batch_inputs.dtype, torch.float32)
+        # images are kept at the top-left, padding is filled with pad_value
+        self.assertTrue(
+            torch.equal(batch_inputs[0, :, :40, :20],
+                        data['inputs'][0].float()))
+        self.assertTrue((batch_inputs[0, :, 40:] == 114).all())
+        self.assertTrue((batch_inputs[1, :, :, 30:] == 114).all())
+        for data_sample in batch_data_samples:
+            self.assertEqual(data_sample.batch_input_shape, (64, 64))
+            self.assertEqual(data_sample.pad_shape, (64, 64))
+
+        # the padding is filled with raw pixels before normalization
+        processor = YOLOXPoseDetDataPreprocessor(
+            mean=[100., 110., 120.],
+            std=[2., 4., 8.],
+            pad_size_divisor=32,
+            pad_to_square=True,
+            pad_value=114)
+        out_data = processor(data, training=False)
+        batch_inputs = out_data['inputs']
+        self.assertEqual(batch_inputs.shape, (2, 3, 64, 64))
+        expected_pad = torch.tensor([(114 - 100) / 2, (114 - 110) / 4,
+                                     (114 - 120) / 8])
+        self.assertTrue(
+            torch.allclose(batch_inputs[0, :, 63, 63], expected_pad))
+        self.assertTrue(
+            torch.allclose(batch_inputs[0, :, :40, :20],
+                           (data['inputs'][0].float() -
+                            processor.mean) / processor.std))